@@ -1,10 +1,64 @@
+import sys
+
+if sys.version_info < (3, 11):
+    sys.exit("This script requires Python 3.11 or newer "
+             "(it uses asyncio.TaskGroup and hashlib.file_digest).")
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import asyncio
+import aiohttp
+import aiofiles
+from aiolimiter import AsyncLimiter
 from bs4 import BeautifulSoup
 import os
+import re
+import atexit
+import hashlib
+import math
 import time
+import types
+from http.cookiejar import MozillaCookieJar
 from urllib.parse import urljoin
 
+# Setup logging once at import; basicConfig is a silent no-op on
+# subsequent calls, so configuring per-instance would be misleading
+if not logging.getLogger().handlers:
+    logging.basicConfig(
+        filename='pdf_downloader.log',
+        level=logging.DEBUG,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+# Matches the user-logged-in class on the <body> tag without decoding
+# or parsing the page
+_LOGGED_IN_RE = re.compile(rb'<body[^>]*class="[^"]*\buser-logged-in\b')
+
+# Constant header/param dicts, built once instead of per call
+SESSION_HEADERS = types.MappingProxyType({
+    'Connection': 'keep-alive',
+    'Accept': 'application/json',
+    'Accept-Encoding': 'gzip, br'
+})
+
+SEARCH_PARAMS = types.MappingProxyType({
+    "keyword": "",
+    "type": "slide",
+    "subtype": "",
+    "subtype_sub_level": "",
+    "topic": "",
+    "subtopic": "",
+    "desc": "true",
+    "page_size": 12,
+    "year": "",
+    "conference": "",
+    "sortmode": "Date",
+    "matching": "AND",
+    "searched": "true"
+})
+
 class TCTMDDownloader:
     def __init__(self, username, password, output_dir="downloads", test_mode=False):
         self.base_url = "https://www.tctmd.com"
@@ -15,17 +69,54 @@ class TCTMDDownloader:
         self.output_dir = output_dir
         self.test_mode = test_mode
         self.session = requests.Session()
-        
-        # Setup logging
-        logging.basicConfig(
-            filename='pdf_downloader.log',
-            level=logging.DEBUG,
-            format='%(asctime)s - %(levelname)s - %(message)s'
+
+        # Reuse pooled keep-alive connections and retry transient server errors
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=32,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504))
         )
-        
+        self.session.mount('https://', adapter)
+        self.session.headers.update(SESSION_HEADERS)
+
+        # Persist cookies across runs so reruns can skip the login flow
+        self.cookie_file = "tctmd_cookies.txt"
+        jar = MozillaCookieJar(self.cookie_file)
+        self._loaded_cookies = False
+        if os.path.exists(self.cookie_file):
+            try:
+                jar.load(ignore_discard=True)
+                self._loaded_cookies = True
+            except Exception as e:
+                logging.warning(f"Could not load saved cookies: {str(e)}")
+        self.session.cookies = jar
+
         # Create output directory if it doesn't exist
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Ledger of already-downloaded PDF URLs: loaded once into a set for
+        # O(1) membership checks, appended through a single line-buffered handle
+        self.downloaded_file = "downloaded_pdfs.txt"
+        if os.path.exists(self.downloaded_file):
+            with open(self.downloaded_file, "r") as f:
+                self._downloaded = set(f.read().splitlines())
+        else:
+            self._downloaded = set()
+        self._ledger_fh = open(self.downloaded_file, 'a', buffering=1)
+        atexit.register(self.close)
+
+    def close(self):
+        """
+        Flush and close the downloaded-URL ledger.
+        """
+        if not self._ledger_fh.closed:
+            self._ledger_fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
     def login(self):
         """
@@ -49,11 +140,16 @@ class TCTMDDownloader:
                 if json_data.get("success") and "cookie_redirect" in json_data.get("data", {}):
                     cookie_redirect_url = json_data["data"]["cookie_redirect"]
 
-                    # Step 4: Follow the Okta redirect
-                    okta_response = self.session.get(cookie_redirect_url)
+                    # Step 4: Follow the Okta redirect chain; requests/urllib3
+                    # handles the hops and reuses connections between them
+                    okta_response = self.session.get(
+                        cookie_redirect_url, allow_redirects=True, timeout=10
+                    )
+                    for hop in okta_response.history:
+                        logging.debug(f"Okta redirect hop: {hop.status_code} {hop.url}")
                     if okta_response.status_code == 200:
                         logging.info("Successfully authenticated via Okta.")
-                        return True
+                        return self.verify_login()
                     else:
                         logging.error(f"Okta redirect failed with status code {okta_response.status_code}.")
                 else:
@@ -65,149 +161,377 @@ class TCTMDDownloader:
             logging.error(f"Error during login: {str(e)}")
             return False
 
-    def get_presentation_urls_from_api(self, page_num):
+    def _save_cookies(self):
         """
-        Get all presentation URLs directly from the API.
+        Save the session cookies to disk, readable only by the owner
+        since they carry auth tokens.
         """
         try:
-            params = {
-                "keyword": "",
-                "type": "slide",
-                "subtype": "",
-                "subtype_sub_level": "",
-                "topic": "",
-                "subtopic": "",
-                "desc": "true",
-                "page": page_num,
-                "page_size": 12,
-                "year": "",
-                "conference": "",
-                "sortmode": "Date",
-                "matching": "AND",
-                "searched": "true"
-            }
+            self.session.cookies.save(ignore_discard=True)
+            os.chmod(self.cookie_file, 0o600)
+            logging.info(f"Saved session cookies to {self.cookie_file}")
+        except Exception as e:
+            logging.warning(f"Could not save cookies: {str(e)}")
 
-            # Send GET request to the API
-            response = self.session.get(self.api_url, params=params)
+    def verify_login(self, probe=False):
+        """
+        Verify the session is actually logged in. The Okta flow sets an
+        SSESS* session cookie, so its presence is checked first; only when
+        that heuristic fails do we fall back to polling the homepage for
+        the user-logged-in body class. Pass probe=True to skip the cookie
+        heuristic and ask the server — cookies reloaded from disk always
+        exist but may belong to a long-expired server-side session.
+        """
+        try:
+            if not probe and any(c.name.startswith('SSESS') for c in self.session.cookies):
+                logging.info("Login verified via session cookie.")
+                return True
 
-            if response.status_code == 200:
-                data = response.json()
-
-                # Extract presentation URLs from API response
-                items = data.get("data", {}).get("items", [])
-                logging.debug(f"API response items: {items}")
-
-                presentations = []
-                for item in items:
-                    url = item.get("url")  # Use 'url' field instead of 'location'
-                    if url:  # Only process if 'url' is not None
-                        presentations.append(url)
-                        logging.info(f"Valid presentation URL: {url}")
-                    else:
-                        logging.warning(f"Item has no valid URL: {item}")
+            for _ in range(10):
+                response = self.session.get(self.base_url)
+                if _LOGGED_IN_RE.search(response.content):
+                    logging.info("Login verified.")
+                    return True
+                time.sleep(0.1)
+            logging.error("Login verification failed: homepage never reported user-logged-in.")
+            return False
+        except Exception as e:
+            logging.error(f"Error during login verification: {str(e)}")
+            return False
 
-                logging.info(f"Found {len(presentations)} presentations on page {page_num}.")
-                return presentations
+    async def _fetch_search_page(self, session, page_num, page_sem):
+        """
+        Fetch one page of search results from the API; returns the decoded
+        JSON payload, or None on failure.
+        """
+        try:
+            params = {**SEARCH_PARAMS, "page": page_num}
 
-            else:
-                logging.error(f"API request failed with status code {response.status_code}.")
-                return []
+            async with page_sem, self._limiter:
+                async with session.get(self.api_url, params=params) as response:
+                    if response.status == 200:
+                        return await response.json()
+                    logging.error(f"API request failed with status code {response.status}.")
 
         except Exception as e:
             logging.error(f"Error getting presentation URLs from API: {str(e)}")
-            return []
+        return None
 
-    def get_pdf_url_from_presentation(self, presentation_url):
+    @staticmethod
+    def _extract_presentation_urls(payload, page_num):
         """
-        Get PDF download URL from a presentation detail page
+        Extract presentation URLs from an API response payload.
         """
-        try:
-            response = self.session.get(presentation_url)
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+        items = payload.get("data", {}).get("items", [])
+        logging.debug(f"API response items: {items}")
+
+        presentations = []
+        for item in items:
+            url = item.get("url")  # Use 'url' field instead of 'location'
+            if url:  # Only process if 'url' is not None
+                presentations.append(url)
+                logging.info(f"Valid presentation URL: {url}")
+            else:
+                logging.warning(f"Item has no valid URL: {item}")
 
-                # Look for PDF download link
-                pdf_link = soup.find('a', attrs={'href': lambda x: x and x.endswith('.pdf')})
-                if pdf_link and pdf_link.get('href'):
-                    pdf_url = pdf_link['href']
-                    logging.info(f"Found PDF link: {pdf_url}")
-                    return pdf_url
+        logging.info(f"Found {len(presentations)} presentations on page {page_num}.")
+        return presentations
 
-                logging.warning(f"No PDF link found in presentation: {presentation_url}")
+    async def _enqueue_search_page(self, session, page_num, page_sem, url_q):
+        """
+        Fetch one search page and feed its presentation URLs to the scrapers.
+        """
+        if self._stop.is_set():
+            return
+        payload = await self._fetch_search_page(session, page_num, page_sem)
+        if payload:
+            for url in self._extract_presentation_urls(payload, page_num):
+                await url_q.put(url)
+
+    async def _fetch_pdf_url(self, session, presentation_url):
+        """
+        Get PDF download URL from a presentation detail page
+        """
+        try:
+            async with self._limiter, session.get(presentation_url) as response:
+                if response.status == 200:
+                    # lxml is a C extension, several times faster than html.parser;
+                    # passing raw bytes lets it sniff the encoding itself
+                    soup = BeautifulSoup(await response.read(), 'lxml')
+
+                    # Look for PDF download link; the CSS selector is evaluated
+                    # in C rather than calling a Python predicate per <a> tag
+                    pdf_link = soup.select_one('a[href$=".pdf"]')
+                    if pdf_link and pdf_link.get('href'):
+                        pdf_url = pdf_link['href']
+                        logging.info(f"Found PDF link: {pdf_url}")
+                        return pdf_url
+
+                    logging.warning(f"No PDF link found in presentation: {presentation_url}")
             return None
         except Exception as e:
             logging.error(f"Error getting PDF URL from presentation {presentation_url}: {str(e)}")
             return None
 
-    def download_pdf(self, url):
+    @staticmethod
+    def _hash_file(filename):
+        """
+        SHA-256 of a file on disk. file_digest releases the GIL, so this
+        runs on a worker thread without stalling the event loop.
+        """
+        with open(filename, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').hexdigest()
+
+    async def _verify_digest(self, filename):
+        """
+        Compare a file against its recorded SHA-256 sidecar. Returns True
+        when no digest has been recorded (nothing to check against).
+        """
+        digest_file = filename + '.sha256'
+        if not os.path.exists(digest_file):
+            return True
+        async with aiofiles.open(digest_file, 'r') as df:
+            expected = (await df.read()).strip()
+        actual = await asyncio.to_thread(self._hash_file, filename)
+        return actual == expected
+
+    async def _download_pdf(self, session, url, sem):
         """
         Download a single PDF
         """
         try:
             filename = os.path.join(self.output_dir, url.split('/')[-1])
+            etag_file = filename + '.etag'
 
             # Skip if already downloaded
-            if os.path.exists(filename):
-                logging.info(f"PDF already exists: {filename}")
+            if url in self._downloaded:
+                logging.info(f"PDF already recorded in ledger: {url}")
                 return True
 
-            response = self.session.get(url, stream=True)
-            if response.status_code == 200:
-                with open(filename, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                logging.info(f"Successfully downloaded: {filename}")
-                return True
-            else:
-                logging.error(f"Failed to download {url}: Status code {response.status_code}")
-                return False
+            # HEAD preflight: skip if the file on disk already matches the
+            # server's Content-Length, and revalidate by ETag otherwise
+            async with self._limiter, session.head(url, allow_redirects=True) as head:
+                content_length = int(head.headers.get('Content-Length', -1))
+
+            # A conditional GET is only safe when the local copy exists and
+            # nothing above found it invalid; a failed size or digest check
+            # must force a full re-download, not a 304
+            revalidate = False
+            stale = False
+            if os.path.exists(filename):
+                if content_length >= 0 and os.path.getsize(filename) != content_length:
+                    logging.info(f"Size mismatch for {filename}, re-downloading.")
+                    stale = True
+                elif not await self._verify_digest(filename):
+                    logging.warning(f"Digest mismatch for {filename}, re-downloading.")
+                    stale = True
+                elif content_length >= 0:
+                    logging.info(f"PDF already exists with matching size: {filename}")
+                    return True
+                else:
+                    # No Content-Length to compare against: let the server
+                    # decide via the stored ETag
+                    revalidate = True
+
+            if stale:
+                # Drop the bad copy's sidecars so a stale ETag or digest
+                # cannot suppress or outlive the re-download
+                for sidecar in (etag_file, filename + '.sha256'):
+                    if os.path.exists(sidecar):
+                        os.remove(sidecar)
+
+            request_headers = {}
+            if revalidate and os.path.exists(etag_file):
+                async with aiofiles.open(etag_file, 'r') as ef:
+                    request_headers['If-None-Match'] = (await ef.read()).strip()
+
+            # Semaphore caps concurrent downloads, the limiter smooths the
+            # request rate, and 429 responses honour Retry-After with
+            # per-worker exponential backoff
+            for attempt in range(3):
+                async with sem, self._limiter:
+                    async with session.get(url, headers=request_headers) as response:
+                        if response.status == 304:
+                            logging.info(f"PDF unchanged on server (304): {filename}")
+                            self._downloaded.add(url)
+                            self._ledger_fh.write(url + '\n')
+                            return True
+                        if response.status == 200:
+                            # 1 MiB chunks keep the number of read/write round-trips
+                            # low for multi-MB PDFs
+                            async with aiofiles.open(filename, 'wb', buffering=1 << 20) as f:
+                                async for chunk in response.content.iter_chunked(1 << 20):
+                                    await f.write(chunk)
+                            etag = response.headers.get('ETag')
+                            if etag:
+                                async with aiofiles.open(etag_file, 'w') as ef:
+                                    await ef.write(etag)
+                            digest = await asyncio.to_thread(self._hash_file, filename)
+                            async with aiofiles.open(filename + '.sha256', 'w') as df:
+                                await df.write(digest)
+                            self._downloaded.add(url)
+                            self._ledger_fh.write(url + '\n')
+                            logging.info(f"Successfully downloaded: {filename}")
+                            return True
+                        if response.status != 429:
+                            logging.error(f"Failed to download {url}: Status code {response.status}")
+                            return False
+                        retry_delay = int(response.headers.get('Retry-After', 5)) * (2 ** attempt)
+                        logging.warning(f"Rate limited on {url}; retrying in {retry_delay}s.")
+                await asyncio.sleep(retry_delay)
+
+            logging.error(f"Giving up on {url}: still rate limited after 3 attempts.")
+            return False
 
         except Exception as e:
             logging.error(f"Error in download_pdf: {str(e)}")
             return False
 
+    async def _produce_presentation_urls(self, session, url_q, n_scrapers):
+        """
+        Stage 1: fetch page 1 to learn the result count, then fetch the
+        remaining search pages concurrently, feeding presentation URLs
+        into the scrape queue as each page lands.
+        """
+        page_sem = asyncio.Semaphore(8)
+
+        first = await self._fetch_search_page(session, 1, page_sem)
+        if first:
+            for url in self._extract_presentation_urls(first, 1):
+                await url_q.put(url)
+
+            total = first.get("data", {}).get("total")
+            if total:
+                total_pages = math.ceil(total / SEARCH_PARAMS["page_size"])
+                await asyncio.gather(
+                    *(self._enqueue_search_page(session, p, page_sem, url_q)
+                      for p in range(2, total_pages + 1))
+                )
+            else:
+                # Total not reported: fall back to serial pagination
+                # until a page comes back empty
+                page_num = 2
+                while not self._stop.is_set():
+                    payload = await self._fetch_search_page(session, page_num, page_sem)
+                    presentations = (
+                        self._extract_presentation_urls(payload, page_num) if payload else []
+                    )
+                    if not presentations:
+                        logging.info("No more presentations found.")
+                        break
+                    for url in presentations:
+                        await url_q.put(url)
+                    page_num += 1  # Move to the next page
+
+        # One sentinel per scrape worker closes the queue
+        for _ in range(n_scrapers):
+            await url_q.put(None)
+
+    async def _scrape_worker(self, session, url_q, pdf_q):
+        """
+        Stage 2: pull presentation URLs and extract their PDF links.
+        """
+        while True:
+            presentation_url = await url_q.get()
+            if presentation_url is None:
+                break
+            if self._stop.is_set():
+                continue  # keep draining so the producer's sentinels arrive
+
+            logging.info(f"Processing presentation: {presentation_url}")
+            pdf_url = await self._fetch_pdf_url(session, presentation_url)
+            if pdf_url:
+                await pdf_q.put(pdf_url)
+            else:
+                logging.warning(f"Could not get PDF URL from {presentation_url}")
+
+    async def _download_worker(self, session, pdf_q, sem):
+        """
+        Stage 3: pull PDF URLs and write them to disk.
+        """
+        while True:
+            pdf_url = await pdf_q.get()
+            if pdf_url is None:
+                break
+            if self._stop.is_set():
+                continue
+
+            if await self._download_pdf(session, pdf_url, sem):
+                self._total_downloads += 1
+                logging.info(f"Successfully downloaded {self._total_downloads} PDFs.")
+
+                # Stop if in test mode and downloaded 2 PDFs
+                if self.test_mode and self._total_downloads >= 2:
+                    logging.info("Test mode enabled. Stopping after 2 PDFs.")
+                    self._stop.set()
+
+    async def _close_pdf_queue(self, scrapers, pdf_q, n_downloaders):
+        """
+        Once every scrape worker has finished, close the download queue.
+        """
+        await asyncio.gather(*scrapers)
+        for _ in range(n_downloaders):
+            await pdf_q.put(None)
+
+    async def _download_all_pdfs(self):
+        """
+        Async driver: three pipeline stages (paginate -> scrape -> download)
+        connected by queues, so page fetches, PDF-link extraction and disk
+        writes all overlap.
+        """
+        n_scrapers = 4
+        n_downloaders = 8
+        sem = asyncio.Semaphore(10)
+        # Token bucket: under 5 req/s nothing waits, above it requests
+        # are smoothed instead of hard-sleeping
+        self._limiter = AsyncLimiter(max_rate=5, time_period=1)
+        url_q = asyncio.Queue()
+        pdf_q = asyncio.Queue()
+        self._total_downloads = 0
+        self._stop = asyncio.Event()
+
+        connector = aiohttp.TCPConnector(limit=20)
+        # Reuse the cookies established by the requests-based login flow
+        cookies = {c.name: c.value for c in self.session.cookies}
+        # Default headers mirror the requests session (minus Connection,
+        # which aiohttp manages itself) so the search API keeps returning
+        # JSON and responses stay compressed
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip, br'}
+
+        async with aiohttp.ClientSession(
+            connector=connector, cookies=cookies, headers=headers
+        ) as session:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._produce_presentation_urls(session, url_q, n_scrapers))
+                scrapers = [
+                    tg.create_task(self._scrape_worker(session, url_q, pdf_q))
+                    for _ in range(n_scrapers)
+                ]
+                for _ in range(n_downloaders):
+                    tg.create_task(self._download_worker(session, pdf_q, sem))
+                tg.create_task(self._close_pdf_queue(scrapers, pdf_q, n_downloaders))
+
+        logging.info(f"Finished downloading {self._total_downloads} PDFs")
+        return True
+
     def download_all_pdfs(self):
         """
         Download all PDFs from search results
         """
         try:
-            if not self.login():
-                logging.error("Failed to login. Exiting.")
-                return False
+            # Reuse persisted cookies only when the server still accepts
+            # them; otherwise run the full login flow and save the new jar
+            if self._loaded_cookies and self.verify_login(probe=True):
+                logging.info("Saved cookies still valid; skipping login.")
+            else:
+                if not self.login():
+                    logging.error("Failed to login. Exiting.")
+                    return False
+                self._save_cookies()
 
             logging.info("Successfully logged in, searching for presentations...")
 
-            page_num = 1
-            total_downloads = 0
-
-            while True:
-                presentations = self.get_presentation_urls_from_api(page_num)
-
-                if not presentations:
-                    logging.info("No more presentations found.")
-                    break
-
-                for presentation_url in presentations:
-                    logging.info(f"Processing presentation: {presentation_url}")
-                    pdf_url = self.get_pdf_url_from_presentation(presentation_url)
-
-                    if pdf_url:
-                        if self.download_pdf(pdf_url):
-                            total_downloads += 1
-                            logging.info(f"Successfully downloaded {total_downloads} PDFs.")
-
-                            # Stop if in test mode and downloaded 2 PDFs
-                            if self.test_mode and total_downloads >= 2:
-                                logging.info("Test mode enabled. Stopping after 2 PDFs.")
-                                return True
-                    else:
-                        logging.warning(f"Could not get PDF URL from {presentation_url}")
-
-                page_num += 1  # Move to the next page
-
-            logging.info(f"Finished downloading {total_downloads} PDFs")
-            return True
+            return asyncio.run(self._download_all_pdfs())
 
         except Exception as e:
             logging.error(f"Error in download_all_pdfs: {str(e)}")
@@ -220,5 +544,5 @@ if __name__ == "__main__":
     PASSWORD = "your_password"
 
     # Set test_mode=True to only download 2 PDFs
-    downloader = TCTMDDownloader(USERNAME, PASSWORD, test_mode=True)
-    downloader.download_all_pdfs()
\ No newline at end of file
+    with TCTMDDownloader(USERNAME, PASSWORD, test_mode=True) as downloader:
+        downloader.download_all_pdfs()
\ No newline at end of file